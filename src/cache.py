@@ -0,0 +1,98 @@
+# src/cache.py
+# Дисковый кеш результатов по отпечатку (fingerprint) входных данных.
+# Хранится в SQLite, при превышении max_bytes вытесняются давно не использованные записи.
+import os
+import json
+import time
+import sqlite3
+import hashlib
+from types import CodeType
+
+CACHE_PATH = "data/cache/results.sqlite"
+CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+
+def fingerprint(*parts):
+    """Стабильный хеш от JSON-сериализуемых частей (dict сортируется по ключам)"""
+    raw = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def _code_parts(code):
+    consts = [_code_parts(c) if isinstance(c, CodeType) else repr(c) for c in code.co_consts]
+    return [code.co_code.hex(), consts, list(code.co_names)]
+
+
+def code_strings(*funcs):
+    """Строковые константы в коде функций (включая вложенные) — например, ключи PARAMS["..."]"""
+    found = set()
+    stack = [f.__code__ for f in funcs]
+    while stack:
+        for c in stack.pop().co_consts:
+            if isinstance(c, CodeType):
+                stack.append(c)
+            elif isinstance(c, str):
+                found.add(c)
+    return found
+
+
+def code_version(*funcs):
+    """Хеш байткода и констант функций: правка логики (порогов, коэффициентов) сбрасывает кеш"""
+    return fingerprint([_code_parts(f.__code__) for f in funcs])
+
+
+class ResultCache:
+    def __init__(self, path=CACHE_PATH, max_bytes=CACHE_MAX_BYTES):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.max_bytes = max_bytes
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, accessed REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS cache_accessed ON cache(accessed)")
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, keys):
+        """{key: value} для найденных ключей; время обращения обновляется одним UPDATE на чанк"""
+        keys = list(set(keys))
+        found = {}
+        now = time.time()
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            marks = ",".join("?" * len(chunk))
+            for k, v in self.conn.execute(f"SELECT key, value FROM cache WHERE key IN ({marks})", chunk):
+                found[k] = json.loads(v)
+            self.conn.execute(f"UPDATE cache SET accessed = ? WHERE key IN ({marks})", [now] + chunk)
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, items):
+        now = time.time()
+        rows = []
+        for k, v in items.items():
+            raw = json.dumps(v, ensure_ascii=False)
+            rows.append((k, raw, len(raw.encode("utf-8")), now))
+        self.conn.executemany("INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)", rows)
+        self.evict()
+        self.conn.commit()
+
+    def evict(self):
+        """Удаляем самые старые по обращению записи, пока не уложимся в max_bytes"""
+        total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        freed, stale = 0, []
+        for k, size in self.conn.execute("SELECT key, size FROM cache ORDER BY accessed"):
+            stale.append((k,))
+            freed += size
+            if freed >= excess:
+                break
+        self.conn.executemany("DELETE FROM cache WHERE key = ?", stale)
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
@@ -0,0 +1,155 @@
+# src/cube.py
+# Агрегатный куб операций: source × city × status × category × currency × month (+ client_code),
+# собирается за тот же проход, что и признаки (features.py), и отвечает на срезы/роллапы
+# без чтения сырых выписок. Уровень client_code хранится, чтобы distinct clients
+# корректно считались при любом роллапе (уникальные клиенты не суммируются).
+# source — transactions (траты, category = категория) или transfers (переводы, category = type);
+# city и status берутся из профиля клиента в clients.csv, а не из строк выписок.
+import os
+import argparse
+from pathlib import Path
+
+import pandas as pd
+
+CUBE_PATH = "data/processed/spend_cube.csv.gz"
+CLIENTS_RAW = "data/raw/clients.csv"
+EDA_REPORT = Path("reports/eda_report.md")
+
+DIMENSIONS = ["source", "city", "status", "category", "currency", "month"]
+CUBE_KEYS = ["client_code"] + DIMENSIONS
+
+_cube = {}  # path -> (mtime, куб): пересобранный файл перечитывается
+
+
+def load_profiles(path=CLIENTS_RAW):
+    """client_code -> {"city": ..., "status": ...} из clients.csv"""
+    if not os.path.exists(path):
+        return {}
+    clients = pd.read_csv(path, encoding="utf-8-sig", dtype=str)
+    clients.columns = [str(c).strip() for c in clients.columns]
+    cols = [c for c in ("city", "status") if c in clients.columns]
+    clients["client_code"] = clients["client_code"].str.strip()
+    return clients.set_index("client_code")[cols].to_dict("index")
+
+
+def _cells(source, frame, category_col, profile):
+    return pd.DataFrame({
+        "source": source,
+        "city": profile.get("city") or "unknown",
+        "status": profile.get("status") or "unknown",
+        "category": frame[category_col] if category_col in frame.columns else "unknown",
+        "currency": frame["currency"] if "currency" in frame.columns else "KZT",
+        "month": pd.to_datetime(frame["date"], errors="coerce").dt.strftime("%Y-%m")
+                 if "date" in frame.columns else "unknown",
+        "amount": pd.to_numeric(frame["amount"], errors="coerce"),
+    }, index=frame.index)
+
+
+def client_cube(client_id, transactions, transfers=None, profile=None):
+    """Вклад одного клиента в куб: сумма и число операций по ячейкам"""
+    profile = profile or {}
+    frames = [_cells(source, frame, category_col, profile)
+              for source, frame, category_col in (("transactions", transactions, "category"),
+                                                  ("transfers", transfers, "type"))
+              if frame is not None and not frame.empty and "amount" in frame.columns]
+    if not frames:
+        return pd.DataFrame(columns=CUBE_KEYS + ["amount", "count"])
+    ops = pd.concat(frames, ignore_index=True)
+    ops[DIMENSIONS] = ops[DIMENSIONS].fillna("unknown")
+    part = ops.groupby(DIMENSIONS, sort=True)["amount"].agg(amount="sum", count="count").reset_index()
+    part.insert(0, "client_code", client_id)
+    return part
+
+
+def save_cube(parts, path=CUBE_PATH):
+    cube = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=CUBE_KEYS + ["amount", "count"])
+    cube["client_code"] = cube["client_code"].astype(str)
+    cube = cube.sort_values(CUBE_KEYS, kind="mergesort")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    cube.to_csv(path, index=False, compression="gzip")
+    return path
+
+
+def load_cube(path=CUBE_PATH):
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"❌ Файл {path} не найден. Сначала запусти features.py")
+    mtime = os.path.getmtime(path)
+    cached = _cube.get(path)
+    if cached is None or cached[0] != mtime:
+        _cube[path] = (mtime, pd.read_csv(path, dtype={d: str for d in CUBE_KEYS}))
+    return _cube[path][1]
+
+
+def query_cube(by=("category",), where=None, cube=None):
+    """Роллап куба: сумма, число транзакций и уникальные клиенты по измерениям by.
+    where — фильтр {измерение: значение или список значений}.
+    Пример: query_cube(["city", "status"], {"category": "Такси"})"""
+    cube = load_cube() if cube is None else cube
+    for dim, value in (where or {}).items():
+        values = value if isinstance(value, (list, tuple, set)) else [value]
+        cube = cube[cube[dim].isin([str(v) for v in values])]
+    by = list(by)
+    if not by:
+        return pd.DataFrame([{"amount": cube["amount"].sum(), "count": cube["count"].sum(),
+                              "clients": cube["client_code"].nunique()}])
+    return (cube.groupby(by, sort=True)
+                .agg(amount=("amount", "sum"), count=("count", "sum"), clients=("client_code", "nunique"))
+                .reset_index()
+                .sort_values("amount", ascending=False, kind="mergesort"))
+
+
+def _md_table(df):
+    cols = list(df.columns)
+    lines = ["| " + " | ".join(cols) + " |", "|" + "---|" * len(cols)]
+    for row in df.itertuples(index=False):
+        lines.append("| " + " | ".join(f"{v:,.0f}".replace(",", " ") if isinstance(v, float) else str(v)
+                                       for v in row) + " |")
+    return "\n".join(lines) + "\n"
+
+
+def write_eda_report(path=EDA_REPORT):
+    """EDA-отчёт только по кубу — без чтения сырых CSV"""
+    cube = load_cube()
+    spend = cube[cube["source"] == "transactions"]
+    total = query_cube([], cube=spend).iloc[0]
+    transfers = query_cube([], {"source": "transfers"}, cube=cube).iloc[0]
+    currencies = query_cube(["currency"], cube=cube).sort_values("currency")
+    months = sorted(m for m in cube["month"].unique() if m != "unknown")
+
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("# EDA Report\n\n")
+        f.write(f"- Клиентов: {cube['client_code'].nunique()}\n")
+        f.write(f"- Всего транзакций: {int(total['count'])}\n")
+        f.write(f"- Всего переводов: {int(transfers['count'])}\n")
+        f.write(f"- Сумма трат (KZT): {total['amount']:,.0f}\n".replace(",", " "))
+        f.write(f"- Категории транзакций:\n  {', '.join(sorted(spend['category'].unique()))}\n")
+        ops = [f"{cur} ({int(n)} операций)" for cur, n in zip(currencies["currency"], currencies["count"])]
+        f.write(f"- Валюты: {', '.join(ops)}\n")
+        if months:
+            f.write(f"- Месяцы: {months[0]} → {months[-1]}\n")
+        f.write("\n## Траты по категориям\n\n")
+        f.write(_md_table(query_cube(["category"], cube=spend)))
+        f.write("\n## Траты по городам и статусам\n\n")
+        f.write(_md_table(query_cube(["city", "status"], cube=spend)))
+        f.write("\n## Траты по месяцам\n\n")
+        f.write(_md_table(query_cube(["month"], cube=spend).sort_values("month")))
+        f.write("\n## Топ-3 категории в каждом городе\n\n")
+        by_city = query_cube(["city", "category"], cube=spend)
+        f.write(_md_table(by_city.groupby("city", sort=True).head(3).sort_values(["city", "amount"],
+                                                                                  ascending=[True, False])))
+        f.write("\n## Переводы по типам\n\n")
+        f.write(_md_table(query_cube(["category"], {"source": "transfers"}, cube=cube)))
+    print(f"📄 EDA-отчёт сохранён: {path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Запросы к кубу трат и EDA-отчёт")
+    parser.add_argument("--by", nargs="*", default=None, choices=DIMENSIONS,
+                        help="измерения роллапа; без --by пересобирается EDA-отчёт")
+    parser.add_argument("--where", nargs="*", default=[], metavar="DIM=VALUE")
+    args = parser.parse_args()
+    if args.by is None:
+        write_eda_report()
+    else:
+        where = dict(w.split("=", 1) for w in args.where)
+        print(query_cube(args.by, where).to_string(index=False))
@@ -0,0 +1,205 @@
+# src/deliver_push.py
+# Асинхронная доставка push_results.csv в HTTP push-шлюз:
+# пул соединений, батчи, token bucket, ограничение параллелизма, ретраи и чекпоинт.
+import os
+import csv
+import json
+import time
+import random
+import asyncio
+import hashlib
+import argparse
+from datetime import datetime
+
+import pandas as pd
+
+from sharding import add_shard_argument, filter_shard, shard_input, shard_path
+
+try:
+    import aiohttp
+except ImportError:  # нужен только для доставки
+    aiohttp = None
+
+INPUT = "data/processed/push_results.csv"
+CHECKPOINT = "data/processed/push_delivery.csv"
+
+# --- параметры доставки (переопределяются через env / CLI) ---
+GATEWAY_URL = os.environ.get("PUSH_GATEWAY_URL", "http://127.0.0.1:8080/push/batch")
+DELIVERY = {
+    "batch_size": 500,          # сообщений в одном HTTP-запросе
+    "concurrency": 32,          # одновременных запросов
+    "rate_per_sec": 50000,      # лимит сообщений в секунду (token bucket)
+    "pool_size": 64,            # размер пула соединений
+    "max_retries": 5,
+    "backoff_base": 0.2,        # сек, экспоненциальный backoff с джиттером
+    "backoff_max": 10.0,
+    "timeout": 30.0,
+}
+
+CHECKPOINT_COLUMNS = ["client_code", "message_id", "status", "http_status", "attempts", "delivered_at"]
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def positive_int(value):
+    v = int(value)
+    if v < 1:
+        raise argparse.ArgumentTypeError(f"ожидается целое >= 1, получено {value}")
+    return v
+
+
+def positive_float(value):
+    v = float(value)
+    if not v > 0:
+        raise argparse.ArgumentTypeError(f"ожидается число > 0, получено {value}")
+    return v
+
+
+def message_id(client_code, push):
+    """Идемпотентный ключ сообщения: шлюз может отбрасывать повторы по нему"""
+    return hashlib.sha1(f"{client_code}|{push}".encode("utf-8")).hexdigest()
+
+
+class TokenBucket:
+    """Token bucket: rate токенов в секунду, ёмкость capacity"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self, n=1):
+        n = min(n, self.capacity)
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= n:
+                    self.tokens -= n
+                    return
+                await asyncio.sleep((n - self.tokens) / self.rate)
+
+
+def load_checkpoint(path=CHECKPOINT):
+    """message_id уже доставленных сообщений"""
+    if not os.path.exists(path):
+        return set()
+    done = pd.read_csv(path, dtype={"client_code": object, "message_id": object})
+    return set(done.loc[done["status"] == "delivered", "message_id"])
+
+
+def load_messages(input_path=INPUT, delivered=frozenset(), shard=None):
+    df = filter_shard(pd.read_csv(input_path, dtype={"client_code": object}), shard)
+    df["push"] = df["push"].fillna("")
+    df = df[df["push"].str.strip() != ""]
+    messages = []
+    for r in df[["client_code", "product", "push"]].to_dict("records"):
+        mid = message_id(r["client_code"], r["push"])
+        if mid not in delivered:
+            messages.append({"message_id": mid, "client_code": r["client_code"],
+                             "product": r["product"], "text": r["push"]})
+    return messages
+
+
+async def send_batch(session, url, batch, cfg):
+    """POST батча с ретраями; возвращает (status, http_status, attempts)"""
+    payload = json.dumps({"messages": batch}, ensure_ascii=False).encode("utf-8")
+    http_status = None
+    for attempt in range(1, cfg["max_retries"] + 1):
+        try:
+            async with session.post(url, data=payload,
+                                    headers={"Content-Type": "application/json"}) as resp:
+                http_status = resp.status
+                await resp.read()
+                if resp.status < 300:
+                    return "delivered", http_status, attempt
+                if resp.status not in RETRY_STATUSES:
+                    return "failed", http_status, attempt
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            http_status = None
+        if attempt == cfg["max_retries"]:
+            break
+        delay = min(cfg["backoff_max"], cfg["backoff_base"] * 2 ** (attempt - 1))
+        await asyncio.sleep(delay * (0.5 + random.random() / 2))
+    return "failed", http_status, cfg["max_retries"]
+
+
+async def deliver(messages, url, cfg, checkpoint_path=CHECKPOINT):
+    batches = [messages[i:i + cfg["batch_size"]] for i in range(0, len(messages), cfg["batch_size"])]
+    bucket = TokenBucket(cfg["rate_per_sec"], max(cfg["rate_per_sec"], cfg["batch_size"]))
+    sem = asyncio.Semaphore(cfg["concurrency"])
+    stats = {"delivered": 0, "failed": 0}
+
+    new_file = not os.path.exists(checkpoint_path)
+    with open(checkpoint_path, "a", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        if new_file:
+            writer.writerow(CHECKPOINT_COLUMNS)
+            f.flush()
+
+        connector = aiohttp.TCPConnector(limit=cfg["pool_size"], keepalive_timeout=60)
+        timeout = aiohttp.ClientTimeout(total=cfg["timeout"])
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+
+            async def worker(batch):
+                async with sem:
+                    await bucket.acquire(len(batch))
+                    status, http_status, attempts = await send_batch(session, url, batch, cfg)
+                ts = datetime.now().isoformat(timespec="seconds")
+                writer.writerows([m["client_code"], m["message_id"], status, http_status, attempts, ts]
+                                 for m in batch)
+                f.flush()  # чекпоинт после каждого батча — при падении повторно не отправим
+                stats[status] += len(batch)
+
+            await asyncio.gather(*(worker(b) for b in batches))
+    return stats
+
+
+def run_delivery(url=GATEWAY_URL, input_path=INPUT, checkpoint_path=CHECKPOINT, shard=None, **overrides):
+    if aiohttp is None:
+        print("❌ Для доставки нужен aiohttp: pip install aiohttp")
+        return
+    input_path = shard_input(input_path, shard)
+    checkpoint_path = shard_path(checkpoint_path, shard)
+    if not os.path.exists(input_path):
+        print(f"❌ Нет {input_path} — сначала запустите generate_push.py")
+        return
+    cfg = {**DELIVERY, **{k: v for k, v in overrides.items() if v is not None}}
+    for key in ("batch_size", "concurrency", "max_retries", "pool_size"):
+        if cfg[key] < 1:
+            raise ValueError(f"{key} должен быть >= 1, получено {cfg[key]}")
+    if not cfg["rate_per_sec"] > 0:
+        raise ValueError(f"rate_per_sec должен быть > 0, получено {cfg['rate_per_sec']}")
+
+    delivered = load_checkpoint(checkpoint_path)
+    messages = load_messages(input_path, delivered, shard)
+    print(f"📨 К отправке: {len(messages)} (уже доставлено ранее: {len(delivered)})")
+    if not messages:
+        print("✅ Нечего отправлять")
+        return
+
+    started = time.perf_counter()
+    stats = asyncio.run(deliver(messages, url, cfg, checkpoint_path))
+    elapsed = time.perf_counter() - started
+
+    print(f"✅ Доставлено: {stats['delivered']}, ошибок: {stats['failed']}")
+    print(f"⏱ {elapsed:.2f} с, {len(messages) / max(elapsed, 1e-9):,.0f} сообщений/с")
+    print(f"🗄 Чекпоинт: {checkpoint_path}")
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Отправка push_results.csv в push-шлюз")
+    parser.add_argument("--url", default=GATEWAY_URL)
+    parser.add_argument("--input", default=INPUT)
+    parser.add_argument("--checkpoint", default=CHECKPOINT)
+    parser.add_argument("--batch-size", type=positive_int)
+    parser.add_argument("--concurrency", type=positive_int)
+    parser.add_argument("--rate", type=positive_float, dest="rate_per_sec")
+    parser.add_argument("--max-retries", type=positive_int, help="число попыток на батч (>= 1)")
+    args = add_shard_argument(parser).parse_args()
+    run_delivery(args.url, args.input, args.checkpoint, args.shard,
+                 batch_size=args.batch_size, concurrency=args.concurrency,
+                 rate_per_sec=args.rate_per_sec, max_retries=args.max_retries)
@@ -1,9 +1,13 @@
 # src/evaluate.py
 import os
 import re
+import argparse
 import pandas as pd
 from pathlib import Path
 
+from push_similarity import analyze_pushes
+from sharding import add_shard_argument, filter_shard, shard_input, shard_output
+
 INPUT = "data/processed/push_results.csv"
 OUT_METRICS = "data/processed/scores_metrics.csv"
 REPORT = Path("reports/evaluation.md")
@@ -24,11 +28,12 @@ def emojis_count(text):
     if not isinstance(text, str): return 0
     return len(re.findall(r"[\U0001F300-\U0001F6FF\U0001F600-\U0001F64F]", text))
 
-def run_evaluation():
-    if not os.path.exists(INPUT):
+def run_evaluation(shard=None):
+    input_path = shard_input(INPUT, shard)
+    if not os.path.exists(input_path):
         print("❌ Нет push_results.csv — сначала запустите generate_push.py")
         return
-    df = pd.read_csv(INPUT, dtype={"client_code": object})
+    df = filter_shard(pd.read_csv(input_path, dtype={"client_code": object}), shard)
     # basic checks
     df["push"] = df["push"].fillna("")
     df["len_ok"] = df["push"].apply(lambda t: len(str(t)) <= 200)
@@ -42,6 +47,9 @@ def run_evaluation():
     unique_pushes = df["push"].nunique()
     total = len(df)
 
+    # near-duplicates: одинаковые с точностью до имени/сумм (скелет + MinHash/LSH, потоково)
+    similarity = analyze_pushes(input_path, shard=shard)
+
     # product distribution
     dist = df["product"].value_counts().to_dict()
 
@@ -61,7 +69,7 @@ def run_evaluation():
             return 0
         df["hit_top4"] = df.apply(hit_top4_row, axis=1)
         # save per-client metrics
-        df[["client_code","hit_top1","hit_top4"]].to_csv(OUT_METRICS, index=False, encoding="utf-8-sig")
+        df[["client_code","hit_top1","hit_top4"]].to_csv(shard_output(OUT_METRICS, shard), index=False, encoding="utf-8-sig")
         top1_rate = df["hit_top1"].mean()
         top4_rate = df["hit_top4"].mean()
     else:
@@ -72,6 +80,9 @@ def run_evaluation():
     summary = {
         "total_clients": total,
         "unique_push_texts": unique_pushes,
+        "distinct_push_skeletons": similarity["distinct_skeletons"],
+        "near_duplicate_clusters": similarity["near_duplicate_clusters"],
+        "near_duplicate_pct": similarity["near_duplicate_pct"],
         "pushes_non_empty_pct": df["not_empty"].mean(),
         "len_ok_pct": df["len_ok"].mean(),
         "cta_ok_pct": df["cta_ok"].mean(),
@@ -83,11 +94,20 @@ def run_evaluation():
     }
 
     # write evaluation.md
-    with open(REPORT, "w", encoding="utf-8") as f:
+    with open(shard_output(str(REPORT), shard), "w", encoding="utf-8") as f:
         f.write("# Evaluation Report\n\n")
         f.write("## Summary\n\n")
         for k,v in summary.items():
             f.write(f"- *{k}*: {v}\n")
+        f.write("\n## Template diversity\n\n")
+        f.write("| product | pushes | skeletons | diversity |\n|---|---|---|---|\n")
+        for product, d in similarity["diversity_by_template"].items():
+            f.write(f"| {product} | {d['pushes']} | {d['skeletons']} | {d['diversity']} |\n")
+        f.write("\n## Near-duplicate clusters (up to 20)\n\n")
+        if not similarity["clusters"]:
+            f.write("No near-duplicate pushes found.\n")
+        for c in similarity["clusters"][:20]:
+            f.write(f"- size: {c['size']}, variants: {c['variants']}, example: \"{c['example']}\"\n")
         f.write("\n## Failing examples (up to 20)\n\n")
         fails = df[(~df["len_ok"]) | (~df["cta_ok"]) | (~df["caps_ok"]) | (~df["emoji_ok"]) | (~df["not_empty"])]
         if fails.empty:
@@ -102,4 +122,5 @@ def run_evaluation():
         print(f"- {k}: {v}")
 
 if __name__ == "__main__":
-    run_evaluation()
\ No newline at end of file
+    args = add_shard_argument(argparse.ArgumentParser()).parse_args()
+    run_evaluation(args.shard)
\ No newline at end of file
@@ -1,8 +1,14 @@
 import pandas as pd
 import os
 import glob
+import argparse
 from datetime import datetime
 
+from cube import CUBE_PATH, client_cube, load_profiles, save_cube
+from fx import currency_volumes, to_kzt
+from sharding import add_shard_argument, in_shard, shard_output, shard_path, start_run
+from validate import QUARANTINE, SUMMARY, validate, write_quarantine
+
 RAW_PATH = "data/raw/"
 PROCESSED_PATH = "data/processed/"
 
@@ -21,7 +27,7 @@ def load_client_data(client_id):
 
 
 def extract_features(client_id, transactions, transfers):
-    """Извлекаем признаки клиента"""
+    """Извлекаем признаки клиента (суммы уже в KZT — см. to_kzt в run_features)"""
     features = {"client_id": client_id}
 
     # Общие расходы
@@ -47,36 +53,63 @@ def extract_features(client_id, transactions, transfers):
         features["transfers_in"] = incoming
         features["transfers_out"] = outgoing
 
+    # Объёмы по валютам (в KZT-эквиваленте)
+    features.update(currency_volumes(transactions, transfers))
+
     return features
 
 
-def run_features():
-    print("🚀 Извлечение признаков для всех клиентов...")
+def run_features(shard=None):
+    print("🚀 Извлечение признаков для всех клиентов..." if shard is None
+          else f"🚀 Извлечение признаков, шард {shard[0]}/{shard[1]}...")
+    # первая стадия шарда открывает новый прогон: следующие стадии читают только его выходы
+    start_run(shard)
 
     # ищем все транзакционные файлы
-    transaction_files = glob.glob(os.path.join(RAW_PATH, "client_*_transactions_3m.csv"))
+    # sorted — порядок клиентов не зависит от файловой системы (нужно для reduce шардов)
+    transaction_files = sorted(glob.glob(os.path.join(RAW_PATH, "client_*_transactions_3m.csv")))
     client_ids = [os.path.basename(f).split("_")[1] for f in transaction_files]
+    client_ids = [c for c in client_ids if in_shard(c, shard)]
 
     all_features = []
+    cube_parts = []
+    profiles = load_profiles()  # city/status для куба — из профиля клиента, как в clients_full
+    rejected, summaries = [], []
 
     for client_id in client_ids:
         transactions, transfers = load_client_data(client_id)
         if transactions is not None and transfers is not None:
+            # валидация: битые строки — в карантин, дальше идут только корректные
+            transactions, tx_bad, tx_summary = validate(
+                transactions, "transactions", client_id, f"client_{client_id}_transactions_3m.csv")
+            transfers, tr_bad, tr_summary = validate(
+                transfers, "transfers", client_id, f"client_{client_id}_transfers_3m.csv")
+            rejected += [tx_bad, tr_bad]
+            summaries += [tx_summary, tr_summary]
+
+            # все суммы — в KZT по курсу на дату операции, один раз для признаков и куба
+            transactions = to_kzt(transactions)
+            transfers = to_kzt(transfers)
             features = extract_features(client_id, transactions, transfers)
             all_features.append(features)
+            # тот же проход — вклад клиента в куб (траты и переводы)
+            cube_parts.append(client_cube(client_id, transactions, transfers, profiles.get(str(client_id))))
             print(f"✅ Клиент {client_id} обработан")
 
+    if summaries:
+        write_quarantine(rejected, summaries, shard_output(QUARANTINE, shard), shard_output(SUMMARY, shard))
+
     # сохраняем в общий файл
     if all_features:
         df = pd.DataFrame(all_features)
         os.makedirs(PROCESSED_PATH, exist_ok=True)
 
         # основной файл
-        output_file = os.path.join(PROCESSED_PATH, "clients_features.csv")
+        output_file = shard_output(os.path.join(PROCESSED_PATH, "clients_features.csv"), shard)
 
         # архивная копия с датой
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        archive_file = os.path.join(PROCESSED_PATH, f"clients_features_{timestamp}.csv")
+        archive_file = shard_path(os.path.join(PROCESSED_PATH, f"clients_features_{timestamp}.csv"), shard)
 
         # если файл существует — удаляем перед записью
         if os.path.exists(output_file):
@@ -87,9 +120,13 @@ def run_features():
 
         print(f"📄 Файл clients_features.csv сохранён: {output_file}")
         print(f"🗄 Архивная версия сохранена: {archive_file}")
+
+        cube_file = save_cube(cube_parts, shard_output(CUBE_PATH, shard))
+        print(f"🧊 Куб трат сохранён: {cube_file}")
     else:
         print("⚠️ Не найдено клиентов для обработки")
 
 
 if __name__ == "__main__":
-    run_features()
+    args = add_shard_argument(argparse.ArgumentParser()).parse_args()
+    run_features(args.shard)
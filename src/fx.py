@@ -0,0 +1,99 @@
+# src/fx.py
+# Приведение сумм к KZT по локальной таблице курсов с as-of join по дате и валюте.
+import os
+
+import pandas as pd
+
+FX_RATES = "data/raw/fx_rates.csv"  # date,currency,rate — сколько KZT за 1 единицу валюты
+BASE_CURRENCY = "KZT"
+
+_rates = {}     # path -> (таблица курсов, (первый, последний) курс по каждой валюте)
+_warned = set()  # предупреждения печатаются один раз за прогон
+
+
+def rate_bounds(rates):
+    """(первый, последний) курс по валюте — для дат вне таблицы и нераспознанных дат"""
+    by_currency = rates.groupby("currency")["rate"]
+    return by_currency.first(), by_currency.last()
+
+
+def _warn_once(key, message):
+    if key not in _warned:
+        _warned.add(key)
+        print(message)
+
+
+def _load(path):
+    if path not in _rates:
+        if not os.path.exists(path):
+            rates = pd.DataFrame({"date": pd.Series(dtype="datetime64[ns]"),
+                                  "currency": pd.Series(dtype=object), "rate": pd.Series(dtype=float)})
+        else:
+            rates = pd.read_csv(path, encoding="utf-8-sig")
+            rates["date"] = pd.to_datetime(rates["date"], errors="coerce")
+            rates["currency"] = rates["currency"].astype(str).str.strip().str.upper()
+            rates["rate"] = pd.to_numeric(rates["rate"], errors="coerce")
+            rates = rates.dropna().sort_values("date", kind="mergesort").reset_index(drop=True)
+        _rates[path] = (rates, rate_bounds(rates))
+    return _rates[path]
+
+
+def load_fx_rates(path=FX_RATES):
+    """Таблица курсов, отсортированная по дате (загружается один раз на процесс для каждого path)"""
+    return _load(path)[0]
+
+
+def to_kzt(df, rates=None, path=FX_RATES):
+    """Пересчитывает amount в KZT: курс на дату операции или ближайший предыдущий.
+    Исходная сумма сохраняется в amount_orig. Для дат раньше таблицы берётся первый курс,
+    для нераспознанных дат — последний. Валюты без курса остаются как есть (с предупреждением)."""
+    if "amount" not in df.columns:
+        return df
+    df = df.copy()
+    df["amount"] = pd.to_numeric(df["amount"], errors="coerce")
+    df["amount_orig"] = df["amount"]
+    if "currency" not in df.columns:
+        df["currency"] = BASE_CURRENCY
+        return df
+    df["currency"] = df["currency"].fillna(BASE_CURRENCY).astype(str).str.strip().str.upper()
+
+    foreign = df["currency"] != BASE_CURRENCY
+    if not foreign.any():
+        return df
+
+    if rates is None:
+        rates, (first, last) = _load(path)
+    else:
+        first, last = rate_bounds(rates)
+    if rates.empty:
+        _warn_once(("no_table", path), f"⚠️ Нет таблицы курсов {path}: суммы не в KZT остаются без пересчёта")
+        return df
+    left = pd.DataFrame({
+        "_row": df.index[foreign],
+        "date": pd.to_datetime(df.loc[foreign, "date"], errors="coerce").values if "date" in df.columns else pd.NaT,
+        "currency": df.loc[foreign, "currency"].values,
+    })
+
+    # один sorted merge на весь кусок: merge_asof по дате внутри каждой валюты
+    dated = left.dropna(subset=["date"]).sort_values("date", kind="mergesort")
+    joined = pd.merge_asof(dated, rates, on="date", by="currency", direction="backward")
+    rate = pd.Series(joined["rate"].values, index=joined["_row"].values).reindex(left["_row"])
+
+    cur = pd.Series(left["currency"].values, index=left["_row"].values)
+    no_date = pd.Series(left["date"].isna().values, index=left["_row"].values)
+    rate = rate.fillna(cur[no_date].map(last)).fillna(cur.map(first))
+
+    missing = rate.isna()
+    for currency in sorted(cur[missing].unique()):
+        _warn_once(("no_rate", path, currency), f"⚠️ Нет курса {currency} в {path}: такие суммы остаются без пересчёта")
+    df.loc[rate.index, "amount"] = df.loc[rate.index, "amount"] * rate.fillna(1.0)
+    return df
+
+
+def currency_volumes(*frames):
+    """Объём операций по валютам в KZT-эквиваленте: {"volume_USD": ..., ...}"""
+    parts = [f[["currency", "amount"]] for f in frames if {"currency", "amount"} <= set(f.columns)]
+    if not parts:
+        return {}
+    sums = pd.concat(parts, ignore_index=True).groupby("currency")["amount"].sum()
+    return {f"volume_{cur}": value for cur, value in sums.items()}
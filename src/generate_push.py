@@ -3,9 +3,13 @@ import os
 import re
 import math
 import json
+import argparse
 from pathlib import Path
 import pandas as pd
 
+from cache import ResultCache, code_version, fingerprint
+from sharding import add_shard_argument, filter_shard, shard_input, shard_output
+
 # Пути
 CLIENTS_FULL = "data/processed/clients_full.csv"
 SCORES_ALL = "data/processed/scores.csv"        # опционально: все продукты (scoring.py)
@@ -73,13 +77,36 @@ def get_top4_by_scores(client_code, scores_all_df):
     df_sorted = df.sort_values(["benefit_est_KZT", "product"], ascending=[False, True])
     return list(df_sorted["product"].astype(str).tolist())[:4]
 
+def template_version(product):
+    return fingerprint(TEMPLATES.get(product, TEMPLATES["default"]))
+
+# версия рендеринга: увеличить при изменениях, которые не видны в коде функций ниже
+RENDER_VERSION = 1
+
+def render_version():
+    """Код и константы, от которых зависит текст push (кроме самого шаблона)"""
+    return fingerprint(RENDER_VERSION, FALLBACK_PRODUCTS, CTAS,
+                       code_version(safe_float, format_money_kzt, enforce_text, get_top4_by_scores,
+                                    write_report, generate_pushes))
+
+def write_report(client_code, name, recs, benefit_val, push):
+    rec_1, rec_2, rec_3, rec_4 = recs
+    with open(REPORTS_DIR / f"client_{client_code}_push.md", "w", encoding="utf-8") as f:
+        f.write(f"# Push — client {client_code}\n\n")
+        f.write(f"Name: {name}\n\n")
+        f.write(f"rec_1: {rec_1}\nrec_2: {rec_2}\nrec_3: {rec_3}\nrec_4: {rec_4}\n\n")
+        f.write(f"benefit_est_KZT: {benefit_val}\n\n")
+        f.write("Push text:\n\n")
+        f.write(push + "\n")
+
 # --- основное ---
-def generate_pushes():
-    if not os.path.exists(CLIENTS_FULL):
+def generate_pushes(use_cache=True, shard=None):
+    clients_path = shard_input(CLIENTS_FULL, shard)
+    if not os.path.exists(clients_path):
         print("❌ Нет clients_full.csv. Сначала запустите merge_data.py")
         return
 
-    clients = pd.read_csv(CLIENTS_FULL, dtype={"client_code": object})
+    clients = filter_shard(pd.read_csv(clients_path, dtype={"client_code": object}), shard)
     # нормализуем числовые колонки, чтобы не было NaN
     num_cols = [c for c in clients.columns if c.startswith("spent_")] + ["total_spent","avg_transaction","transfers_in","transfers_out","avg_monthly_balance_KZT"]
     for c in num_cols:
@@ -87,56 +114,80 @@ def generate_pushes():
             clients[c] = pd.to_numeric(clients[c], errors="coerce").fillna(0)
 
     scores_all = None
-    if os.path.exists(SCORES_ALL):
-        scores_all = pd.read_csv(SCORES_ALL, dtype={"client_code": object})
+    scores_by_client = {}
+    scores_path = shard_input(SCORES_ALL, shard)
+    if os.path.exists(scores_path):
+        scores_all = filter_shard(pd.read_csv(scores_path, dtype={"client_code": object}), shard)
         scores_all["benefit_est_KZT"] = pd.to_numeric(scores_all["benefit_est_KZT"], errors="coerce").fillna(0)
+        scores_by_client = {str(k): g for k, g in scores_all.groupby(scores_all["client_code"].astype(str))}
+
+    # ключ кеша: признаки клиента + его скоры + версия кода рендеринга; шаблон проверяется отдельно по rec_1,
+    # чтобы правка одного шаблона пересчитывала только клиентов с этим продуктом
+    cache = ResultCache() if use_cache else None
+    records = clients.to_dict("records")
+    render_v = render_version()
+    keys = []
+    for r in records:
+        client_code = str(r.get("client_code"))
+        client_scores = scores_by_client.get(client_code)
+        scores_fp = None if client_scores is None else client_scores[["product", "benefit_est_KZT"]].values.tolist()
+        keys.append(fingerprint("push", r, scores_fp, render_v))
+    cached = cache.get_many(keys) if cache else {}
+    fresh = {}
 
     out_rows = []
-    for _, r in clients.iterrows():
-        client_code = str(r.get("client_code", r.name))
+    for i, (r, key) in enumerate(zip(records, keys)):
+        client_code = str(r.get("client_code", i))
         name = r.get("name", "Клиент")
-        balance = safe_float(r.get("avg_monthly_balance_KZT", 0))
-        total_spent = safe_float(r.get("total_spent", 0))
-
-        # получаем топ-4 продуктов детерминированно:
-        recs = []
-        if scores_all is not None:
-            recs = get_top4_by_scores(client_code, scores_all)
-        # если нет или меньше 4, дополняем fallback в порядке списка (детерминир.)
-        for p in FALLBACK_PRODUCTS:
-            if p not in recs:
-                recs.append(p)
-            if len(recs) >= 4:
-                break
-        rec_1, rec_2, rec_3, rec_4 = recs[:4]
-
-        # benefit: берем из scores_all (первый найден) или 0
-        benefit_val = 0.0
-        if scores_all is not None:
-            srow = scores_all[(scores_all["client_code"].astype(str) == client_code) & (scores_all["product"].astype(str) == rec_1)]
-            if not srow.empty:
-                benefit_val = safe_float(srow["benefit_est_KZT"].iloc[0])
-
-        # текст пуша: берем шаблон по rec_1, подставляем переменные
-        template = TEMPLATES.get(rec_1, TEMPLATES["default"])
-        push_raw = template.format(
-            name=name,
-            amount=format_money_kzt(total_spent),
-            balance=format_money_kzt(balance),
-            benefit=format_money_kzt(benefit_val),
-            product=rec_1
-        )
-        push = enforce_text(push_raw)
-
-        # сохранить per-client отчет (md)
-        with open(REPORTS_DIR / f"client_{client_code}_push.md", "w", encoding="utf-8") as f:
-            f.write(f"# Push — client {client_code}\n\n")
-            f.write(f"Name: {name}\n\n")
-            f.write(f"rec_1: {rec_1}\nrec_2: {rec_2}\nrec_3: {rec_3}\nrec_4: {rec_4}\n\n")
-            f.write(f"benefit_est_KZT: {benefit_val}\n\n")
-            f.write("Push text:\n\n")
-            f.write(push + "\n")
 
+        hit = cached.get(key)
+        if hit is not None and hit["template_v"] == template_version(hit["recs"][0]):
+            recs, benefit_val, push = hit["recs"], hit["benefit"], hit["push"]
+            report_path = REPORTS_DIR / f"client_{client_code}_push.md"
+            if not report_path.exists():
+                write_report(client_code, name, recs, benefit_val, push)
+        else:
+            balance = safe_float(r.get("avg_monthly_balance_KZT", 0))
+            total_spent = safe_float(r.get("total_spent", 0))
+            client_scores = scores_by_client.get(client_code)
+
+            # получаем топ-4 продуктов детерминированно:
+            recs = []
+            if client_scores is not None:
+                recs = get_top4_by_scores(client_code, client_scores)
+            # если нет или меньше 4, дополняем fallback в порядке списка (детерминир.)
+            for p in FALLBACK_PRODUCTS:
+                if p not in recs:
+                    recs.append(p)
+                if len(recs) >= 4:
+                    break
+            recs = recs[:4]
+            rec_1 = recs[0]
+
+            # benefit: берем из scores_all (первый найден) или 0
+            benefit_val = 0.0
+            if client_scores is not None:
+                srow = client_scores[client_scores["product"].astype(str) == rec_1]
+                if not srow.empty:
+                    benefit_val = safe_float(srow["benefit_est_KZT"].iloc[0])
+
+            # текст пуша: берем шаблон по rec_1, подставляем переменные
+            template = TEMPLATES.get(rec_1, TEMPLATES["default"])
+            push_raw = template.format(
+                name=name,
+                amount=format_money_kzt(total_spent),
+                balance=format_money_kzt(balance),
+                benefit=format_money_kzt(benefit_val),
+                product=rec_1
+            )
+            push = enforce_text(push_raw)
+
+            # сохранить per-client отчет (md)
+            write_report(client_code, name, recs, benefit_val, push)
+            fresh[key] = {"recs": recs, "benefit": benefit_val, "push": push,
+                          "template_v": template_version(rec_1)}
+
+        rec_1, rec_2, rec_3, rec_4 = recs
         out_rows.append({
             "client_code": client_code,
             "name": name,
@@ -148,10 +199,17 @@ def generate_pushes():
             "rec_4": rec_4
         })
 
+    if cache:
+        cache.put_many(fresh)
+        cache.close()
+        print(f"♻️ Кеш push: из кеша {len(out_rows) - len(fresh)}, пересчитано {len(fresh)}")
+
     df_out = pd.DataFrame(out_rows)
-    df_out.to_csv(OUT, index=False, encoding="utf-8-sig")
-    print(f"✅ push_results сохранён: {OUT}")
+    out_path = shard_output(OUT, shard)
+    df_out.to_csv(out_path, index=False, encoding="utf-8-sig")
+    print(f"✅ push_results сохранён: {out_path}")
     print(f"✅ per-client отчёты: {REPORTS_DIR}")
 
 if __name__ == "__main__":
-    generate_pushes()
\ No newline at end of file
+    args = add_shard_argument(argparse.ArgumentParser()).parse_args()
+    generate_pushes(shard=args.shard)
\ No newline at end of file
@@ -1,15 +1,22 @@
 import pandas as pd
 import os
+import argparse
 from datetime import datetime
 
+from sharding import add_shard_argument, filter_shard, shard_input, shard_output, shard_path
+
 RAW_PATH = "data/raw/clients.csv"
 PROCESSED_PATH = "data/processed/clients_features.csv"
 OUTPUT_PATH = "data/processed/clients_full.csv"
 
-def merge_data():
+def merge_data(shard=None):
     # Загружаем данные
     clients = pd.read_csv(RAW_PATH)
-    features = pd.read_csv(PROCESSED_PATH)
+    features_path = shard_input(PROCESSED_PATH, shard)
+    if not os.path.exists(features_path):
+        print(f"❌ Нет {features_path} — сначала запустите features.py")
+        return
+    features = pd.read_csv(features_path)
 
     print("Колонки в clients.csv:", clients.columns.tolist())
     print("Колонки в clients_features.csv:", features.columns.tolist())
@@ -26,24 +33,27 @@ def merge_data():
 
     # Объединяем
     df = pd.merge(clients, features, left_on=key_clients, right_on=key_features, how="inner")
+    df = filter_shard(df, shard, key_clients)
 
     os.makedirs("data/processed", exist_ok=True)
 
     # Архивная версия
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    archive_file = f"data/processed/clients_full_{timestamp}.csv"
+    archive_file = shard_path(f"data/processed/clients_full_{timestamp}.csv", shard)
+    output_path = shard_output(OUTPUT_PATH, shard)
 
     # Если файл существует — удаляем
-    if os.path.exists(OUTPUT_PATH):
-        os.remove(OUTPUT_PATH)
+    if os.path.exists(output_path):
+        os.remove(output_path)
 
     # Сохраняем обе версии
-    df.to_csv(OUTPUT_PATH, index=False)
+    df.to_csv(output_path, index=False)
     df.to_csv(archive_file, index=False)
 
-    print(f"✅ Итоговый файл сохранён: {OUTPUT_PATH}")
+    print(f"✅ Итоговый файл сохранён: {output_path}")
     print(f"🗄 Архивная версия сохранена: {archive_file}")
 
 
 if __name__ == "__main__":
-    merge_data()
+    args = add_shard_argument(argparse.ArgumentParser()).parse_args()
+    merge_data(args.shard)
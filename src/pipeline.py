@@ -1,30 +1,33 @@
 import os
+import argparse
 import pandas as pd
 
 from data_ingest import load_and_clean
 from features import run_features
 from merge_data import merge_data
 from recommender import run_recommender
+from sharding import add_shard_argument, shard_path
 
 PROCESSED_FULL = "data/processed/clients_full.csv"
 
-def run_pipeline():
-    print("🚀 Запуск пайплайна...")
+def run_pipeline(shard=None):
+    print("🚀 Запуск пайплайна..." if shard is None else f"🚀 Запуск пайплайна, шард {shard[0]}/{shard[1]}...")
 
     # 1. Формирование признаков для всех клиентов
     print("\n🧮 Шаг 1. Формирование признаков...")
-    run_features()
+    run_features(shard)
 
     # 2. Объединение с профилями клиентов
     print("\n🔗 Шаг 2. Объединение с профилями...")
-    merge_data()
+    merge_data(shard)
 
     # 3. Генерация рекомендаций для всех клиентов
     print("\n🤖 Шаг 3. Генерация рекомендаций...")
-    if os.path.exists(PROCESSED_FULL):
-        df = pd.read_csv(PROCESSED_FULL)
+    full_path = shard_path(PROCESSED_FULL, shard)
+    if os.path.exists(full_path):
+        df = pd.read_csv(full_path)
         for client_code in df["client_code"].unique():
-            run_recommender(client_code)
+            run_recommender(client_code, full_path)
     else:
         print("❌ Нет файла clients_full.csv — сначала запусти merge_data.py")
 
@@ -32,4 +35,5 @@ def run_pipeline():
 
 
 if __name__ == "__main__":
-    run_pipeline()
+    args = add_shard_argument(argparse.ArgumentParser()).parse_args()
+    run_pipeline(args.shard)
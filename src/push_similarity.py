@@ -0,0 +1,161 @@
+# src/push_similarity.py
+# Поиск почти одинаковых push-текстов без попарного сравнения O(n²):
+# 1) каждый текст сводится к «скелету» (имя и числа заменены плейсхолдерами) — точные дубли по скелету;
+# 2) различные скелеты кластеризуются MinHash + LSH — почти дубли среди скелетов.
+# push_results.csv читается чанками, в памяти живут только счётчики по скелетам.
+import re
+import math
+import hashlib
+import argparse
+from collections import Counter, defaultdict
+
+import pandas as pd
+
+from sharding import filter_shard
+
+INPUT = "data/processed/push_results.csv"
+CHUNK_SIZE = 50000
+
+MINHASH = {
+    "num_perm": 64,       # длина сигнатуры
+    "bands": 16,          # LSH: 16 полос по 4 строки -> порог кандидатов ≈ 0.5
+    "shingle": 2,         # шинглы по словам
+    "threshold": 0.7,     # минимальная оценка Жаккара для склейки
+}
+
+_MERSENNE = (1 << 61) - 1
+_NUM_RE = re.compile(r"\d[\d\s .,]*")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def skeleton(text, name=None):
+    """Шаблонный скелет текста: имя -> <name>, числа -> <num>"""
+    s = str(text)
+    if isinstance(name, str) and name:
+        s = s.replace(name, "<name>")
+    s = _NUM_RE.sub("<num> ", s)
+    return _SPACE_RE.sub(" ", s).strip().lower()
+
+
+def _hash64(s):
+    return int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def _permutations(n):
+    perms = []
+    for i in range(n):
+        a = _hash64(f"a{i}") % (_MERSENNE - 1) + 1
+        b = _hash64(f"b{i}") % _MERSENNE
+        perms.append((a, b))
+    return perms
+
+
+def minhash(text, perms, k=MINHASH["shingle"]):
+    words = text.split()
+    shingles = {" ".join(words[i:i + k]) for i in range(max(1, len(words) - k + 1))}
+    hashes = [_hash64(sh) for sh in shingles]
+    return tuple(min((a * h + b) % _MERSENNE for h in hashes) for a, b in perms)
+
+
+def _find(parent, x):
+    while parent[x] != x:
+        parent[x] = parent[parent[x]]
+        x = parent[x]
+    return x
+
+
+def cluster_skeletons(skeletons, params=MINHASH):
+    """LSH по сигнатурам: сравниваются только скелеты, совпавшие хотя бы в одной полосе"""
+    perms = _permutations(params["num_perm"])
+    rows = params["num_perm"] // params["bands"]
+    sigs = [minhash(s, perms, params["shingle"]) for s in skeletons]
+    parent = list(range(len(skeletons)))
+
+    for band in range(params["bands"]):
+        buckets = defaultdict(list)
+        for i, sig in enumerate(sigs):
+            buckets[sig[band * rows:(band + 1) * rows]].append(i)
+        # внутри корзины каждый скелет сравнивается только с корнями уже найденных в ней кластеров:
+        # O(k·кластеров) вместо O(k²), когда корзина забита вариантами одного шаблона
+        for ids in buckets.values():
+            roots = []
+            for i in ids:
+                ri = _find(parent, i)
+                for pos, r in enumerate(roots):
+                    r = roots[pos] = _find(parent, r)
+                    if r == ri:
+                        break
+                    similarity = sum(x == y for x, y in zip(sigs[i], sigs[r])) / len(sigs[r])
+                    if similarity >= params["threshold"]:
+                        parent[ri] = r
+                        break
+                else:
+                    roots.append(ri)
+
+    clusters = defaultdict(list)
+    for i in range(len(skeletons)):
+        clusters[_find(parent, i)].append(i)
+    return list(clusters.values())
+
+
+def analyze_pushes(input_path=INPUT, chunksize=CHUNK_SIZE, shard=None):
+    """Кластеры почти одинаковых push и разнообразие по шаблонам (product)"""
+    skel_count = Counter()               # скелет -> число push
+    skel_example = {}                    # скелет -> пример текста
+    product_skel = defaultdict(Counter)  # product -> Counter(скелет)
+    total = 0
+
+    reader = pd.read_csv(input_path, dtype={"client_code": object}, encoding="utf-8-sig",
+                         usecols=lambda c: c in {"client_code", "name", "product", "push"},
+                         chunksize=chunksize)
+    for chunk in reader:
+        chunk = filter_shard(chunk, shard)
+        chunk = chunk[chunk["push"].notna()]
+        names = chunk["name"] if "name" in chunk.columns else [None] * len(chunk)
+        for text, name, product in zip(chunk["push"], names, chunk["product"]):
+            sk = skeleton(text, name)
+            skel_count[sk] += 1
+            skel_example.setdefault(sk, text)
+            product_skel[str(product)][sk] += 1
+        total += len(chunk)
+
+    skeletons = list(skel_count)
+    clusters = []
+    for ids in cluster_skeletons(skeletons):
+        size = sum(skel_count[skeletons[i]] for i in ids)
+        if size > 1:
+            top = max(ids, key=lambda i: skel_count[skeletons[i]])
+            clusters.append({"size": size, "variants": len(ids),
+                             "skeleton": skeletons[top], "example": skel_example[skeletons[top]]})
+    clusters.sort(key=lambda c: (-c["size"], c["skeleton"]))
+
+    diversity = {}
+    for product, counter in sorted(product_skel.items()):
+        n = sum(counter.values())
+        entropy = -sum(c / n * math.log(c / n) for c in counter.values())
+        # нормированная энтропия скелетов: 0 — все push одинаковы по шаблону, 1 — все разные
+        diversity[product] = {"pushes": n, "skeletons": len(counter),
+                              "diversity": round(entropy / math.log(n), 3) if n > 1 else 1.0}
+
+    duplicated = sum(c["size"] for c in clusters)
+    return {
+        "total": total,
+        "distinct_skeletons": len(skeletons),
+        "near_duplicate_clusters": len(clusters),
+        "near_duplicate_pct": duplicated / total if total else 0.0,
+        "clusters": clusters,
+        "diversity_by_template": diversity,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Почти одинаковые push в push_results.csv")
+    parser.add_argument("--input", default=INPUT)
+    args = parser.parse_args()
+    res = analyze_pushes(args.input)
+    print(f"Всего push: {res['total']}, скелетов: {res['distinct_skeletons']}, "
+          f"кластеров почти-дублей: {res['near_duplicate_clusters']}")
+    for c in res["clusters"][:10]:
+        print(f"- {c['size']} push ({c['variants']} вариантов): {c['example']}")
+    for product, d in res["diversity_by_template"].items():
+        print(f"- {product}: {d}")
@@ -5,11 +5,11 @@ import sys
 PROCESSED_PATH = "data/processed/clients_full.csv"
 REPORTS_DIR = "reports/"
 
-def load_data():
+def load_data(path=PROCESSED_PATH):
     """Загружаем объединённые данные по всем клиентам"""
-    if not os.path.exists(PROCESSED_PATH):
-        raise FileNotFoundError(f"❌ Файл {PROCESSED_PATH} не найден. Сначала запусти merge_data.py")
-    return pd.read_csv(PROCESSED_PATH)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"❌ Файл {path} не найден. Сначала запусти merge_data.py")
+    return pd.read_csv(path)
 
 
 def define_segment(features: dict):
@@ -69,8 +69,8 @@ def save_report(client_code, segment, recs):
     print(f"📄 Рекомендации сохранены в {file_path}")
 
 
-def run_recommender(client_code):
-    df = load_data()
+def run_recommender(client_code, path=PROCESSED_PATH):
+    df = load_data(path)
 
     if client_code not in df["client_code"].values:
         print(f"❌ Клиент {client_code} не найден в данных")
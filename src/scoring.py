@@ -2,8 +2,12 @@
 import math
 import pandas as pd
 import os
+import argparse
 from pathlib import Path
 
+from cache import ResultCache, code_strings, code_version, fingerprint
+from sharding import add_shard_argument, filter_shard, shard_input, shard_output
+
 INPUT = "data/processed/clients_full.csv"
 OUT_SCORES = "data/processed/scores.csv"         # все продукты для всех клиентов
 OUT_TOP1 = "data/processed/scores_top1.csv"     # топ-1 продукт для каждого клиента
@@ -172,12 +176,24 @@ PRODUCT_FUNCTIONS = {
     "gold_offer": score_gold,
 }
 
-def run_scoring():
-    if not os.path.exists(INPUT):
-        print(f"❌ Входной файл не найден: {INPUT}")
+# версия логики скоринга: увеличить при изменениях, которые не видны в байткоде score_* (напр. в зависимостях)
+SCORING_VERSION = 1
+
+def scoring_version(product):
+    """Версия результата продукта: PARAMS, которые читает функция скоринга, + код функции и её хелперов.
+    Правка fx_pct сбрасывает только fx_offer, остальные продукты берутся из кеша."""
+    func = PRODUCT_FUNCTIONS[product]
+    used = {k: PARAMS[k] for k in sorted(code_strings(func)) if k in PARAMS}
+    return fingerprint(SCORING_VERSION, used, code_version(func, get_spent, fmt_kzt))
+
+def run_scoring(use_cache=True, shard=None):
+    input_path = shard_input(INPUT, shard)
+    if not os.path.exists(input_path):
+        print(f"❌ Входной файл не найден: {input_path}")
         return
 
-    df = pd.read_csv(INPUT)
+    df = filter_shard(pd.read_csv(input_path), shard)
+    out_scores, out_top1 = shard_output(OUT_SCORES, shard), shard_output(OUT_TOP1, shard)
 
     # --- нормализуем числовые поля чтобы избежать NaN при расчетах ---
     num_cols = [c for c in df.columns if c.startswith("spent_")]
@@ -188,12 +204,30 @@ def run_scoring():
     if num_cols:
         df[num_cols] = df[num_cols].apply(pd.to_numeric, errors="coerce").fillna(0)
 
+    # одна запись кеша на клиента (ключ — отпечаток признаков), внутри — все продукты с версиями;
+    # пересчитываются только продукты, у которых сменилась версия PARAMS/кода скоринга
+    clients = df.to_dict("records")
+    versions = {product: scoring_version(product) for product in PRODUCT_FUNCTIONS}
+    keys = [fingerprint("score", client) for client in clients]
+
+    cache = ResultCache() if use_cache else None
+    cached = cache.get_many(keys) if cache else {}
+    fresh = {}
+    recomputed = 0
+
     rows = []
-    for _, r in df.iterrows():
-        client = r.to_dict()
+    for client, key in zip(clients, keys):
         client_code = client.get("client_code") or client.get("client_id") or client.get("client")
+        entry = cached.get(key, {})
+        stored = {}
         for product, func in PRODUCT_FUNCTIONS.items():
-            benefit, reason, explain = func(client)
+            hit = entry.get(product)
+            if hit and hit[0] == versions[product]:
+                benefit, reason, explain = hit[1:]
+            else:
+                benefit, reason, explain = func(client)
+                recomputed += 1
+            stored[product] = [versions[product], benefit, reason, explain]
             rows.append({
                 "client_code": client_code,
                 "product": product,
@@ -201,17 +235,25 @@ def run_scoring():
                 "reason_code": reason,
                 "explain": explain
             })
+        if stored != entry:
+            fresh[key] = stored
 
     out_df = pd.DataFrame(rows)
     out_df.sort_values(["client_code", "benefit_est_KZT"], ascending=[True, False], inplace=True)
     # save all scores
-    out_df.to_csv(OUT_SCORES, index=False, encoding="utf-8")
+    out_df.to_csv(out_scores, index=False, encoding="utf-8")
     # save top1 per client
     top1 = out_df.groupby("client_code").first().reset_index()
-    top1.to_csv(OUT_TOP1, index=False, encoding="utf-8")
+    top1.to_csv(out_top1, index=False, encoding="utf-8")
+
+    if cache:
+        cache.put_many(fresh)
+        cache.close()
+        print(f"♻️ Кеш скоринга: клиентов в кеше {cache.hits}, пересчитано оценок {recomputed}")
 
-    print(f"✅ Сохранено: {OUT_SCORES}")
-    print(f"✅ Топ-1 продукт для каждого клиента: {OUT_TOP1}")
+    print(f"✅ Сохранено: {out_scores}")
+    print(f"✅ Топ-1 продукт для каждого клиента: {out_top1}")
 
 if __name__ == "__main__":
-    run_scoring()
\ No newline at end of file
+    args = add_shard_argument(argparse.ArgumentParser()).parse_args()
+    run_scoring(shard=args.shard)
\ No newline at end of file
@@ -0,0 +1,264 @@
+# src/sharding.py
+# Разбиение дневного прогона на шарды по стабильному хешу client_code
+# и reduce-шаг, собирающий выходы шардов в результат, идентичный однонодовому прогону.
+import os
+import json
+import zlib
+import argparse
+from datetime import datetime
+
+import pandas as pd
+
+from cube import CUBE_KEYS
+
+CLIENTS_RAW = "data/raw/clients.csv"
+# манифест прогона шарда: run_id и выходы, записанные стадиями этого прогона
+RUN_MANIFEST = "data/processed/run_manifest.json"
+
+# выходы стадий, которые собирает reduce
+SHARDED_OUTPUTS = {
+    "clients_features": "data/processed/clients_features.csv",
+    "clients_full": "data/processed/clients_full.csv",
+    "scores": "data/processed/scores.csv",
+    "scores_top1": "data/processed/scores_top1.csv",
+    "push_results": "data/processed/push_results.csv",
+    "open_test": "data/processed/open_test.csv",
+    "hidden_test": "data/processed/hidden_test.csv",
+    "spend_cube": "data/processed/spend_cube.csv.gz",
+    "quarantine": "data/processed/quarantine.csv",
+    "validation_summary": "data/processed/validation_summary.csv",
+}
+
+# split_sets.py копирует строки как есть — собираем их без преобразования типов
+RAW_TEXT_OUTPUTS = {"open_test", "hidden_test", "spend_cube", "quarantine", "validation_summary"}
+
+
+def parse_shard(value):
+    """'i/N' -> (i, N); None/'' -> None"""
+    if not value:
+        return None
+    try:
+        i, n = (int(x) for x in str(value).split("/"))
+    except ValueError:
+        raise ValueError(f"Неверный формат шарда: {value!r}, ожидается i/N") from None
+    if n < 1 or not 0 <= i < n:
+        raise ValueError(f"Неверный шард {value!r}: нужно 0 <= i < N")
+    return i, n
+
+
+def normalize_code(client_code):
+    s = str(client_code).strip()
+    return s[:-2] if s.endswith(".0") else s
+
+
+def shard_of(client_code, n):
+    """Номер шарда клиента: crc32 стабилен между процессами и машинами (в отличие от hash())"""
+    return zlib.crc32(normalize_code(client_code).encode("utf-8")) % n
+
+
+def in_shard(client_code, shard):
+    return shard is None or shard_of(client_code, shard[1]) == shard[0]
+
+
+def filter_shard(df, shard, column="client_code"):
+    if shard is None:
+        return df
+    mask = df[column].map(lambda c: shard_of(c, shard[1]) == shard[0])
+    return df[mask]
+
+
+def shard_path(path, shard):
+    """clients_full.csv -> clients_full.shard0of4.csv"""
+    if shard is None:
+        return path
+    base, ext = os.path.splitext(path)
+    return f"{base}.shard{shard[0]}of{shard[1]}{ext}"
+
+
+def _manifest_path(shard):
+    return shard_path(RUN_MANIFEST, shard)
+
+
+def load_manifest(shard):
+    path = _manifest_path(shard)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _save_manifest(manifest, shard):
+    path = _manifest_path(shard)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+
+def start_run(shard):
+    """Новый прогон шарда (features.py --shard): выходы прошлых прогонов перестают быть входами"""
+    if shard is None:
+        return None
+    run_id = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    _save_manifest({"run_id": run_id, "outputs": []}, shard)
+    return run_id
+
+
+def shard_output(path, shard):
+    """Путь выхода стадии шарда; файл записывается в манифест текущего прогона"""
+    sharded = shard_path(path, shard)
+    if shard is not None:
+        manifest = load_manifest(shard) or {"run_id": None, "outputs": []}
+        if sharded not in manifest["outputs"]:
+            manifest["outputs"].append(sharded)
+            _save_manifest(manifest, shard)
+    return sharded
+
+
+def shard_input(path, shard):
+    """Вход стадии шарда — только файл шарда, записанный стадией текущего прогона этого шарда.
+    Общий файл молча не подставляется; файл шарда, которого нет в манифесте прогона, —
+    хвост прошлого прогона: падаем, а не считаем по устаревшим данным."""
+    sharded = shard_path(path, shard)
+    if shard is None or not os.path.exists(sharded):
+        return sharded  # стадия сама сообщит, что входа нет
+    manifest = load_manifest(shard)
+    if manifest is None or sharded not in manifest["outputs"]:
+        run = f"прогона {manifest['run_id']}" if manifest else "прогона (нет манифеста)"
+        raise RuntimeError(f"❌ {sharded} не записан в рамках текущего {run} — похоже на остаток прошлого прогона. "
+                           f"Перезапустите стадии шарда с features.py --shard {shard[0]}/{shard[1]}")
+    return sharded
+
+
+def add_shard_argument(parser):
+    parser.add_argument("--shard", type=parse_shard, default=None,
+                        help="обработать только шард i из N (формат i/N)")
+    return parser
+
+
+def client_order():
+    """Порядок клиентов как в однонодовом прогоне (порядок clients.csv)"""
+    clients = pd.read_csv(CLIENTS_RAW, encoding="utf-8-sig")
+    key = "client_code" if "client_code" in clients.columns else clients.columns[0]
+    return {normalize_code(c): i for i, c in enumerate(clients[key])}
+
+
+def reorder(df, column, order):
+    pos = df[column].map(lambda c: order.get(normalize_code(c), len(order)))
+    return df.assign(_pos=pos.values).sort_values("_pos", kind="mergesort").drop(columns="_pos")
+
+
+def feature_file_order(df):
+    """features.py обходит файлы в порядке sorted(glob) — повторяем его"""
+    names = df["client_id"].map(lambda c: f"client_{normalize_code(c)}_transactions_3m.csv")
+    return df.assign(_pos=names.values).sort_values("_pos", kind="mergesort").drop(columns="_pos")
+
+
+def first_seen_columns(df, headers, leading=()):
+    """Порядок колонок как у pd.DataFrame(list_of_dicts): по первой строке с непустым значением.
+    df — объединённая таблица в итоговом порядке строк с колонкой _shard, headers — заголовки
+    файлов шардов. Колонки, впервые встреченные в одной строке, в заголовке её шарда
+    стоят в порядке ключей этой строки — он и разрешает ничьи."""
+    data = df.drop(columns="_shard")
+    notna = data.notna().to_numpy()
+    seen = notna.any(axis=0)
+    first = notna.argmax(axis=0)
+    row_shard = df["_shard"].to_numpy()
+    positions = [{c: i for i, c in enumerate(h)} for h in headers]
+
+    def key(j):
+        if not seen[j]:
+            return (len(data), 0)
+        return (first[j], positions[row_shard[first[j]]].get(data.columns[j], 0))
+
+    rest = [data.columns[j] for j in sorted(range(len(data.columns)), key=key)]
+    return list(leading) + [c for c in rest if c not in leading]
+
+
+def full_columns(df, headers, feature_cols=None):
+    """Колонки clients_full: профиль из clients.csv, затем признаки в порядке clients_features"""
+    clients_cols = pd.read_csv(CLIENTS_RAW, nrows=0, encoding="utf-8-sig").columns.tolist()
+    rest = feature_cols or first_seen_columns(df, headers, clients_cols)
+    return clients_cols + [c for c in rest if c not in clients_cols]
+
+
+def validation_columns(name, df, headers):
+    """Колонки карантина/сводки как у однонодового pd.concat / pd.DataFrame(summaries):
+    по первой строке, где поле есть. Отсутствие в шарде — пустая строка (карантин) или 0 (сводка)."""
+    if name == "quarantine":
+        leading = ["file", "line", "reason"]
+        absent = df.mask(df == "")
+    else:
+        leading = ["file", "kind", "rows", "valid", "rejected"]
+        # коды причин попадают в сводку файла только при n > 0
+        absent = df.mask((df == "0") & ~df.columns.isin(leading))
+    return first_seen_columns(absent, headers, [c for c in leading if c in df.columns])
+
+
+def run_reduce(n):
+    from evaluate import run_evaluation
+
+    print(f"🧩 Reduce {n} шардов...")
+    order = client_order()
+    feature_cols = full_cols = None
+    for name, path in SHARDED_OUTPUTS.items():
+        parts = [shard_path(path, (i, n)) for i in range(n)]
+        missing = [p for p in parts if not os.path.exists(p)]
+        if missing:
+            print(f"⚠️ {name}: нет файлов {missing} — пропускаем")
+            continue
+
+        encoding = "utf-8-sig" if name == "push_results" else "utf-8"
+        if name in RAW_TEXT_OUTPUTS:
+            read_kw = {"dtype": str, "keep_default_na": False}
+        else:
+            # round_trip — float читаются без потери точности, to_csv пишет их так же, как однонодовый прогон
+            read_kw = {"dtype": {"client_code": object} if name == "push_results" else None,
+                       "float_precision": "round_trip"}
+        frames = [pd.read_csv(p, encoding=encoding, **read_kw) for p in parts]
+        headers = [f.columns.tolist() for f in frames]
+        df = pd.concat([f.assign(_shard=i) for i, f in enumerate(frames)], ignore_index=True)
+
+        if name == "scores":
+            df = df.sort_values(["client_code", "benefit_est_KZT"], ascending=[True, False], kind="mergesort")
+        elif name == "spend_cube":
+            df = df.sort_values(CUBE_KEYS, kind="mergesort")
+        elif name == "scores_top1":
+            df = df.sort_values("client_code", kind="mergesort")
+        elif name == "clients_features":
+            df = feature_file_order(df)
+            feature_cols = first_seen_columns(df, headers, ["client_id"])
+            df = df[feature_cols]
+        elif name == "clients_full":
+            df = reorder(df, "client_code", order)
+            full_cols = full_columns(df, headers, feature_cols)
+            df = df[full_cols]
+        elif name in ("quarantine", "validation_summary"):
+            # имена файлов сортируются как sorted(glob) в features.py, transactions раньше transfers
+            df = df.sort_values(["file", "line"] if name == "quarantine" else ["file"], kind="mergesort",
+                                key=lambda c: c.astype(int) if c.name == "line" else c)
+            df = df[validation_columns(name, df, headers)]
+        elif name in ("open_test", "hidden_test"):
+            # split_sets копирует заголовок clients_full — в однонодовом прогоне колонки те же
+            df = reorder(df, "client_code", order)
+            if full_cols is None:
+                full_cols = full_columns(df.mask(df == ""), headers, feature_cols)
+            df = df[full_cols]
+        else:
+            df = reorder(df, "client_code", order)
+
+        df = df.drop(columns="_shard", errors="ignore")
+        if name == "validation_summary":
+            df = df.fillna("0")
+        df.to_csv(path, index=False, encoding=encoding)
+        print(f"✅ {name}: {len(parts)} шардов → {path} ({len(df)} строк)")
+
+    # метрики считаются заново по объединённому push_results — так сводка совпадает с однонодовой
+    if os.path.exists(SHARDED_OUTPUTS["push_results"]):
+        run_evaluation()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reduce выходов шардов")
+    parser.add_argument("n", type=int, help="число шардов N")
+    args = parser.parse_args()
+    run_reduce(args.n)
@@ -1,11 +1,81 @@
-import pandas as pd
-from sklearn.model_selection import train_test_split
+# src/split_sets.py
+# Разбиение клиентов на open/hidden по солёному хешу client_code.
+# Строки читаются и пишутся потоково; принадлежность клиента не зависит от остальных строк,
+# поэтому не меняется при добавлении новых клиентов и одинакова в любом шарде.
+import os
+import csv
+import hashlib
+import argparse
+from collections import defaultdict
 
-df = pd.read_csv("data/processed/clients_full.csv")
+from sharding import add_shard_argument, in_shard, normalize_code, shard_input, shard_output
 
-open_set, hidden_set = train_test_split(df, test_size=0.2, random_state=42)
+INPUT = "data/processed/clients_full.csv"
+OUT_OPEN = "data/processed/open_test.csv"
+OUT_HIDDEN = "data/processed/hidden_test.csv"
 
-open_set.to_csv("data/processed/open_test.csv", index=False)
-hidden_set.to_csv("data/processed/hidden_test.csv", index=False)
+SPLIT_SALT = "bcc-hub-split-v1"
+HIDDEN_SHARE = 0.2
 
-print("✅ open_test.csv и hidden_test.csv созданы")
\ No newline at end of file
+
+def hidden_score(client_code, salt=SPLIT_SALT):
+    """Равномерное число в [0, 1) по sha1(salt|client_code)"""
+    digest = hashlib.sha1(f"{salt}|{normalize_code(client_code)}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") / 2 ** 64
+
+
+def is_hidden(client_code, share=HIDDEN_SHARE, salt=SPLIT_SALT):
+    return hidden_score(client_code, salt) < share
+
+
+def split_sets(share=HIDDEN_SHARE, salt=SPLIT_SALT, stratify=(), shard=None):
+    """stratify — колонки (status, city), по которым печатается доля hidden в каждой страте.
+    Сама принадлежность зависит только от client_code: так клиент не «переезжает» между
+    наборами при смене статуса/города, а доли в стратах совпадают с share в среднем."""
+    input_path = shard_input(INPUT, shard)
+    if not os.path.exists(input_path):
+        print(f"❌ Нет {input_path} — сначала запустите merge_data.py")
+        return
+    out_open, out_hidden = shard_output(OUT_OPEN, shard), shard_output(OUT_HIDDEN, shard)
+
+    counts = {"open": 0, "hidden": 0}
+    strata = defaultdict(lambda: [0, 0])  # страта -> [всего, hidden]
+
+    with open(input_path, newline="", encoding="utf-8-sig") as src, \
+            open(out_open, "w", newline="", encoding="utf-8") as f_open, \
+            open(out_hidden, "w", newline="", encoding="utf-8") as f_hidden:
+        reader = csv.reader(src)
+        header = next(reader)
+        code_idx = header.index("client_code")
+        strat_idx = [header.index(c) for c in stratify if c in header]
+
+        # LF, как у to_csv в остальных стадиях и в reduce
+        w_open = csv.writer(f_open, lineterminator="\n")
+        w_hidden = csv.writer(f_hidden, lineterminator="\n")
+        w_open.writerow(header)
+        w_hidden.writerow(header)
+
+        for row in reader:
+            code = row[code_idx]
+            if not in_shard(code, shard):
+                continue
+            hidden = is_hidden(code, share, salt)
+            (w_hidden if hidden else w_open).writerow(row)
+            counts["hidden" if hidden else "open"] += 1
+            if strat_idx:
+                s = strata[tuple(row[i] for i in strat_idx)]
+                s[0] += 1
+                s[1] += hidden
+
+    print(f"✅ {out_open}: {counts['open']}, {out_hidden}: {counts['hidden']}")
+    for key, (total, hidden) in sorted(strata.items()):
+        print(f"- {' / '.join(key)}: {total} клиентов, hidden {hidden / total:.0%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Разбиение clients_full.csv на open/hidden")
+    parser.add_argument("--share", type=float, default=HIDDEN_SHARE, help="доля hidden")
+    parser.add_argument("--salt", default=SPLIT_SALT)
+    parser.add_argument("--stratify", nargs="*", default=[], choices=["status", "city"])
+    args = add_shard_argument(parser).parse_args()
+    split_sets(args.share, args.salt, args.stratify, args.shard)
@@ -0,0 +1,113 @@
+# src/validate.py
+# Проверка выписок перед features.py: схема, типы, диапазоны, допустимые значения
+# и совпадение client_code с именем файла. Проверки — векторные по колонкам,
+# отбракованные строки уходят в карантин с кодами причин.
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+QUARANTINE = "data/processed/quarantine.csv"
+SUMMARY = "data/processed/validation_summary.csv"
+
+REQUIRED = {
+    "transactions": ["client_code", "date", "category", "amount"],
+    "transfers": ["client_code", "date", "type", "direction", "amount"],
+}
+DIRECTIONS = {"in", "out"}
+MAX_AMOUNT = 1e10  # KZT — всё, что выше, считаем ошибкой выгрузки
+_CURRENCY_RE = re.compile(r"[A-Za-z]{3}")
+
+
+def normalize_columns(df):
+    """Убираем BOM и пробелы из заголовков (\\ufeffclient_code -> client_code)"""
+    return df.rename(columns=lambda c: str(c).replace("\ufeff", "").strip())
+
+
+def by_unique(col, func, missing):
+    """func считается один раз на уникальное значение колонки и раздаётся строкам через коды
+    factorize; пустые (NaN) значения получают missing"""
+    codes, uniques = pd.factorize(col)
+    values = np.array([func(u) for u in uniques] + [missing], dtype=object)
+    return pd.Series(values.take(codes), index=col.index)  # код -1 -> последний элемент (missing)
+
+
+def validate(df, kind, client_id=None, source=""):
+    """Возвращает (валидные строки, отбракованные строки с колонкой reason, сводка по файлу).
+    Валидные строки — с уже приведёнными date (datetime), amount (float), direction (lower)."""
+    df = normalize_columns(df)
+    summary = {"file": source, "kind": kind, "rows": len(df)}
+
+    missing = [c for c in REQUIRED[kind] if c not in df.columns]
+    if missing:
+        rejected = df.assign(line=df.index + 2, reason="MISSING_COLUMN:" + ",".join(missing))
+        summary.update(valid=0, rejected=len(df), **{"MISSING_COLUMN": len(df)})
+        return df.iloc[0:0].reindex(columns=list(df.columns) + missing), rejected, summary
+
+    amount = pd.to_numeric(df["amount"], errors="coerce")
+    # ISO8601: формат не угадывается по первой строке — "2025-06-02" рядом с "2025-06-01 09:10:36" валидна
+    date = pd.to_datetime(df["date"], errors="coerce", format="ISO8601")
+    checks = {
+        "BAD_DATE": date.isna(),
+        "BAD_AMOUNT": amount.isna(),
+        "AMOUNT_OUT_OF_RANGE": (amount < 0) | (amount > MAX_AMOUNT),
+    }
+    # строковые проверки — по уникальным значениям: кодов клиента и валют в файле единицы
+    if client_id is not None:
+        client = str(client_id)
+        checks["CLIENT_MISMATCH"] = by_unique(
+            df["client_code"], lambda c: re.sub(r"\.0$", "", str(c).strip()) != client, True)
+    if "currency" in df.columns:
+        checks["BAD_CURRENCY"] = by_unique(
+            df["currency"], lambda c: not _CURRENCY_RE.fullmatch(str(c).strip()), False)
+    if kind == "transactions":
+        checks["MISSING_CATEGORY"] = by_unique(df["category"], lambda c: str(c).strip() == "", True)
+    else:
+        direction = by_unique(df["direction"], lambda d: str(d).strip().lower(), "nan")
+        checks["BAD_DIRECTION"] = ~direction.isin(DIRECTIONS)
+
+    flags = pd.DataFrame(checks, index=df.index).astype(bool)
+    bad = flags.any(axis=1)
+
+    # коды причин собираются только для отбракованных строк
+    bad_flags = flags[bad]
+    reasons = pd.Series("", index=bad_flags.index)
+    for code in flags.columns:
+        reasons = reasons.where(~bad_flags[code], reasons + "|" + code)
+    rejected = df[bad].assign(line=df.index[bad] + 2, reason=reasons.str.lstrip("|"))
+
+    valid = df[~bad].copy()
+    valid["amount"] = amount[~bad]
+    valid["date"] = date[~bad]
+    if kind == "transfers":
+        valid["direction"] = direction[~bad]
+
+    summary.update(valid=len(valid), rejected=int(bad.sum()),
+                   **{code: int(n) for code, n in flags.sum().items() if n})
+    return valid, rejected, summary
+
+
+def write_quarantine(rejected_frames, summaries, quarantine_path=QUARANTINE, summary_path=SUMMARY):
+    """Карантин: file, line, reason + исходные поля строки; сводка — по строке на файл"""
+    os.makedirs(os.path.dirname(quarantine_path), exist_ok=True)
+    frames = [f.assign(file=s["file"]) for f, s in zip(rejected_frames, summaries) if not f.empty]
+    if frames:
+        q = pd.concat(frames, ignore_index=True)
+        lead = ["file", "line", "reason"]
+        q = q[lead + [c for c in q.columns if c not in lead]]
+    else:
+        q = pd.DataFrame(columns=["file", "line", "reason"])
+    q.to_csv(quarantine_path, index=False, encoding="utf-8")
+
+    # коды причин есть не в каждой строке сводки: пропуски -> 0, счётчики остаются целыми
+    summary = pd.DataFrame(summaries).fillna(0)
+    counts = [c for c in summary.columns if c not in ("file", "kind")]
+    summary[counts] = summary[counts].astype(int)
+    summary.to_csv(summary_path, index=False, encoding="utf-8")
+
+    rejected = int(summary["rejected"].sum()) if not summary.empty else 0
+    print(f"🧹 Валидация: {len(summaries)} файлов, отбраковано строк: {rejected}")
+    if rejected:
+        print(f"⚠️ Карантин: {quarantine_path}, сводка: {summary_path}")
+    return summary